@@ -1,13 +1,14 @@
 import asyncio
+import collections
 import logging
-import random
+import time
 import typing
 
 import aiohttp
 import discord
 from discord.ext import commands
 
-from . import exceptions
+from . import cluster, exceptions, index, objects, reaper, recorder, stream
 from .node import Node
 from .player import Player
 
@@ -17,16 +18,35 @@ __log__ = logging.getLogger(__name__)
 class Client:
 
     def __init__(self, bot: typing.Union[commands.Bot, commands.AutoShardedBot],
-                 loop=None, session: aiohttp.ClientSession = None):
+                 loop=None, session: aiohttp.ClientSession = None,
+                 idle_timeout: float = None, alone_timeout: float = None, intern_tracks: bool = False,
+                 suggestion_size: int = None):
 
         self.bot = bot
         self.loop = loop or asyncio.get_event_loop()
         self.session = session or aiohttp.ClientSession(loop=self.loop)
+        self._owns_session = session is None
 
         self.nodes = {}
+        self.shards = collections.defaultdict(dict)
+        self.cluster = None
+        self.tracks = objects.TrackTable() if intern_tracks else None
+        self.recorder = None
+        self.index = index.PrefixIndex(size=suggestion_size, table=self.tracks) if suggestion_size else None
+
+        self.reaper = None
+        if idle_timeout is not None or alone_timeout is not None:
+            self.reaper = reaper.Reaper(client=self, idle_timeout=idle_timeout, alone_timeout=alone_timeout)
 
         self.bot.add_listener(self._update_handler, 'on_socket_response')
 
+        if isinstance(self.bot, commands.AutoShardedBot):
+            self.bot.add_listener(self._shard_handler, 'on_shard_ready')
+            self.bot.add_listener(self._shard_handler, 'on_shard_resumed')
+        else:
+            self.bot.add_listener(self._resume_handler, 'on_ready')
+            self.bot.add_listener(self._resume_handler, 'on_resumed')
+
     def __repr__(self):
         return f'<DioriteClient node_count={len(self.nodes.values())} player_count={len(self.players.values())}>'
 
@@ -37,6 +57,9 @@ class Client:
 
         if data['t'] == 'VOICE_SERVER_UPDATE':
 
+            if self.recorder is not None:
+                self.recorder.record('gateway', None, data)
+
             guild_id = int(data['d']['guild_id'])
             try:
                 player = self.players[guild_id]
@@ -50,6 +73,9 @@ class Client:
             if int(data['d']['user_id']) != self.bot.user.id:
                 return
 
+            if self.recorder is not None:
+                self.recorder.record('gateway', None, data)
+
             guild_id = int(data['d']['guild_id'])
             try:
                 player = self.players[guild_id]
@@ -58,6 +84,65 @@ class Client:
             else:
                 await player._voice_state_update(data['d'])
 
+    async def _shard_handler(self, shard_id: int) -> None:
+        await self.resync_shard(shard_id)
+
+    async def _resume_handler(self) -> None:
+        await self.resync_shard(self.bot.shard_id or 0)
+
+    def _add_player(self, node: Node, player: Player) -> None:
+
+        node.players[player.guild.id] = player
+        self.shards[player.shard_id][player.guild.id] = player
+
+    def _remove_player(self, player: Player) -> None:
+
+        if player.node.players.get(player.guild.id) is player:
+            del player.node.players[player.guild.id]
+
+        shard = self.shards.get(player.shard_id)
+        if shard is not None and shard.get(player.guild.id) is player:
+            del shard[player.guild.id]
+
+    def get_shard_players(self, shard_id: int) -> typing.Mapping[int, Player]:
+        return self.shards.get(shard_id, {})
+
+    async def resync_shard(self, shard_id: int, concurrency: int = 4, interval: float = 2.5) -> None:
+        # Each player costs one gateway voice state frame, so the rate stays under discord's gateway limit of 120
+        # frames per minute per shard while still resyncing a few players at a time.
+
+        players = [player for player in self.get_shard_players(shard_id).values() if player.is_connected]
+        if not players:
+            return
+
+        __log__.info(f'Client is resyncing {len(players)} players for shard \'{shard_id}\'.')
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def resync(player: Player) -> None:
+
+            async with semaphore:
+
+                if self.bot.get_guild(player.guild.id) is None or self.bot.get_channel(player.voice_channel.id) is None:
+                    __log__.info(f'Player \'{player.guild.id}\' lost its guild or channel while shard '
+                                 f'\'{shard_id}\' was away.')
+                    try:
+                        await player.destroy()
+                    except (exceptions.DioriteException, KeyError):
+                        self._remove_player(player)
+                    return
+
+                # The gateway frame is sent directly rather than through Player.connect, a resync is not activity and
+                # must not hold off the reaper.
+                try:
+                    socket = player._get_shard_socket(player.shard_id)
+                    await socket.voice_state(player.guild.id, str(player.voice_channel.id))
+                except Exception as error:
+                    __log__.warning(f'Player \'{player.guild.id}\' failed to resync its voice state | {error!r}')
+
+                await asyncio.sleep(interval)
+
+        await asyncio.gather(*(resync(player) for player in players))
+
     @property
     def players(self) -> typing.Mapping[int, Player]:
 
@@ -67,7 +152,9 @@ class Client:
 
         return {player.guild.id: player for player in players}
 
-    async def create_node(self, host: str, port: str, identifier: str, password: str, secure: bool = False) -> Node:
+    async def create_node(self, host: str, port: str, identifier: str, password: str, secure: bool = False,
+                          stats_history: int = 720,
+                          roles: typing.Iterable[str] = (Node.SEARCH, Node.PLAYBACK)) -> Node:
 
         await self.bot.wait_until_ready()
 
@@ -76,7 +163,8 @@ class Client:
 
         __log__.debug(f'Node \'{identifier}\' attempting connection.')
 
-        node = Node(client=self, host=host, port=port, identifier=identifier, password=password, secure=secure)
+        node = Node(client=self, host=host, port=port, identifier=identifier, password=password, secure=secure,
+                    stats_history=stats_history, roles=roles)
         await node.connect()
 
         self.nodes[node.identifier] = node
@@ -84,16 +172,238 @@ class Client:
         __log__.info(f'Node \'{identifier}\' connected.')
         return node
 
-    def get_node(self, identifier: str = None) -> typing.Optional[Node]:
+    async def _connect_node(self, node: Node) -> bool:
+
+        try:
+            await node.connect()
+        except (exceptions.DioriteException, aiohttp.ClientError, OSError, asyncio.TimeoutError) as error:
+            __log__.error(f'Node \'{node.identifier}\' failed to connect and was removed | {error!r}')
+            if self.nodes.get(node.identifier) is node:
+                del self.nodes[node.identifier]
+            return False
+        finally:
+            node.connecting = False
+
+        __log__.info(f'Node \'{node.identifier}\' connected.')
+        return True
+
+    async def create_nodes(self, nodes: typing.Iterable[typing.Mapping[str, typing.Any]],
+                           background: bool = False) -> typing.List[Node]:
+
+        await self.bot.wait_until_ready()
+
+        nodes = [{'secure': False, 'stats_history': 720, 'roles': (Node.SEARCH, Node.PLAYBACK), **kwargs}
+                 for kwargs in nodes]
+        identifiers = [kwargs.get('identifier') for kwargs in nodes]
+
+        for identifier in identifiers:
+            if identifier in self.nodes.keys() or identifiers.count(identifier) > 1:
+                raise exceptions.NodeCreationError(f'Node with identifier {identifier!r} already exists.')
+
+        # Every node is built before any of them is registered so that one bad entry does not leave the ones before
+        # it half created.
+        created = []
+        for kwargs in nodes:
+            try:
+                created.append(Node(client=self, **kwargs))
+            except (TypeError, ValueError) as error:
+                raise exceptions.NodeCreationError(f'Node {kwargs.get("identifier")!r} could not be created | '
+                                                   f'{error}')
+
+        for node in created:
+            node.connecting = True
+            self.nodes[node.identifier] = node
+
+        __log__.debug(f'Nodes {identifiers} attempting connection.')
+        for node in created:
+            node.task = self.loop.create_task(self._connect_node(node))
+
+        pending = {node.task for node in created}
+
+        # In the background the first node to connect is enough for the bot to start creating players, the rest
+        # become available to get_node as soon as their own handshake finishes.
+        while pending:
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if background and any(task.result() for task in done):
+                break
+
+        if not any(node.available for node in created) and not pending:
+            raise exceptions.NodeConnectionError(f'None of the nodes {identifiers} were able to connect.')
+
+        # Nodes that failed have already been removed from the client, so only the connected nodes are returned, along
+        # with those still connecting in the background.
+        return [node for node in created if self.nodes.get(node.identifier) is node]
+
+    async def close(self, timeout: float = None, concurrency: int = 50) -> None:
+
+        if self.reaper is not None:
+            self.reaper.stop()
+
+        nodes = list(self.nodes.values())
+        for node in nodes:
+            if node.task is not None and not node.task.done():
+                node.task.cancel()
+
+        # There is no point queueing gateway frames to leave voice channels when the bot is shutting down with us.
+        leave_voice = not self.bot.is_closed()
+        disconnects = asyncio.gather(*(node.disconnect(concurrency=concurrency, leave_voice=leave_voice)
+                                       for node in nodes), return_exceptions=True)
+
+        try:
+            await asyncio.wait_for(disconnects, timeout=timeout)
+        except asyncio.TimeoutError:
+            __log__.warning(f'Client did not tear down all players within {timeout} seconds, closing nodes anyway.')
+
+            for node in nodes:
+                if node.websocket is not None:
+                    await node.websocket.close()
+                self.nodes.pop(node.identifier, None)
+
+        if self.cluster is not None:
+            await self.cluster.close()
+            self.cluster = None
+
+        self.stop_recording()
+        self.bot.remove_listener(self._update_handler, 'on_socket_response')
+
+        if isinstance(self.bot, commands.AutoShardedBot):
+            self.bot.remove_listener(self._shard_handler, 'on_shard_ready')
+            self.bot.remove_listener(self._shard_handler, 'on_shard_resumed')
+        else:
+            self.bot.remove_listener(self._resume_handler, 'on_ready')
+            self.bot.remove_listener(self._resume_handler, 'on_resumed')
+
+        if self._owns_session:
+            await self.session.close()
+
+        __log__.info('Client has been closed.')
+
+    def positions(self) -> typing.Dict[int, float]:
+
+        now = time.monotonic() * 1000
+
+        positions = {}
+        for node in self.nodes.values():
+            positions.update(node.positions(now))
+
+        return positions
+
+    async def broadcast(self, predicate: typing.Optional[typing.Callable[[Player], bool]],
+                        operation: typing.Callable[[Player], typing.Awaitable[typing.Any]],
+                        concurrency: int = 50) -> typing.Dict[int, typing.Any]:
+
+        nodes = list(self.nodes.values())
+        gathered = await asyncio.gather(*(node.broadcast(predicate, operation, concurrency=concurrency)
+                                          for node in nodes), return_exceptions=True)
+
+        results = {}
+        for node, node_results in zip(nodes, gathered):
+            if isinstance(node_results, Exception):
+                __log__.error(f'Node \'{node.identifier}\' failed to broadcast | {node_results!r}')
+                continue
+            results.update(node_results)
+
+        return results
+
+    def start_recording(self, path: str) -> recorder.Recorder:
+
+        if self.recorder is not None:
+            raise RuntimeError(f'This client is already recording to {self.recorder.path!r}.')
+
+        self.recorder = recorder.Recorder(client=self, path=path)
+
+        __log__.info(f'Client started recording traffic to \'{path}\'.')
+        return self.recorder
+
+    def stop_recording(self) -> None:
+
+        if self.recorder is None:
+            return
+
+        self.recorder.close()
+        self.recorder = None
+
+    async def start_cluster(self, path: str) -> cluster.ClusterServer:
+
+        if self.cluster is not None:
+            raise exceptions.NodeCreationError(f'This client is already serving a cluster on {self.cluster.path!r}.')
+
+        server = cluster.ClusterServer(client=self, path=path)
+        await server.start()
+
+        self.cluster = server
+        return server
+
+    async def join_cluster(self, path: str, identifier: str = 'cluster') -> cluster.ClusterNode:
+
+        await self.bot.wait_until_ready()
+
+        if identifier in self.nodes.keys():
+            raise exceptions.NodeCreationError(f'Node with identifier {identifier!r} already exists.')
+
+        node = cluster.ClusterNode(client=self, path=path, identifier=identifier)
+        await node.connect()
+
+        self.nodes[node.identifier] = node
+
+        __log__.info(f'Cluster node \'{identifier}\' connected.')
+        return node
+
+    def _node_load(self, node: Node) -> int:
+
+        load = len(node.players)
+        if self.cluster is not None:
+            load += self.cluster.counts[node.identifier]
+
+        return load
+
+    def get_node(self, identifier: str = None, role: str = None) -> typing.Optional[Node]:
 
         if not self.nodes:
             raise exceptions.NodesNotAvailable('There are no nodes available.')
 
-        if not identifier:  # TODO Find a better way of finding the best node, this is crappy.
-            return random.choice([node for node in self.nodes.values() if node.available])
+        if not identifier:
+
+            nodes = [node for node in self.nodes.values() if node.available and (role is None or role in node.roles)]
+            if not nodes:
+                if role is not None:
+                    raise exceptions.NodesNotAvailable(f'There are no nodes with the {role!r} role available.')
+                raise exceptions.NodesNotAvailable('There are no nodes available.')
+
+            if role == Node.SEARCH:
+                return min(nodes, key=lambda node: (node.requests, self._node_load(node)))
+
+            return min(nodes, key=self._node_load)
 
         return self.nodes.get(identifier, None)
 
+    async def get_tracks(self, query: str) -> typing.Union[objects.Playlist, typing.List[objects.Track], None]:
+        return await self.get_node(role=Node.SEARCH).get_tracks(query)
+
+    def stream_tracks(self, query: str, chunk_size: int = 65536) -> stream.TrackStream:
+        return self.get_node(role=Node.SEARCH).stream_tracks(query, chunk_size=chunk_size)
+
+    async def suggest(self, prefix: str, limit: int = 10, fallback: bool = False) -> typing.List[objects.Track]:
+
+        tracks = self.index.search(prefix, limit=limit) if self.index is not None else []
+        if not fallback or len(tracks) >= limit or not prefix.strip():
+            return tracks
+
+        result = await self.get_tracks(f'ytsearch:{prefix}')
+        if not isinstance(result, list):
+            return tracks
+
+        track_ids = {track.track_id for track in tracks}
+        for track in result:
+            if len(tracks) >= limit:
+                break
+            if track.track_id not in track_ids:
+                track_ids.add(track.track_id)
+                tracks.append(track)
+
+        return tracks
+
     def get_player(self, guild: discord.Guild, cls: typing.Type[Player] = Player, **kwargs) -> Player:
 
         try:
@@ -109,9 +419,12 @@ class Client:
         if not cls:
             cls = Player
 
-        node = self.get_node()
+        node = self.get_node(role=Node.PLAYBACK)
         player = cls(node, guild, **kwargs)
-        node.players[guild.id] = player
+        self._add_player(node, player)
+
+        if self.reaper is not None:
+            self.reaper.schedule(player)
 
         __log__.info(f'Player for guild \'{guild.id}\' was created.')
         return self.players[guild.id]
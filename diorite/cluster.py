@@ -0,0 +1,407 @@
+import asyncio
+import collections
+import itertools
+import json
+import logging
+import typing
+
+from discord.ext import commands
+
+from . import exceptions, objects
+from .node import Node
+from .stream import TrackStream
+from .websocket import WebSocket
+
+__log__ = logging.getLogger(__name__)
+
+# Load track responses for big playlists are sent as a single line, so the default stream limit of 64KiB is too small.
+STREAM_LIMIT = 2 ** 26
+
+
+def _encode(**data) -> bytes:
+    return json.dumps(data, separators=(',', ':')).encode() + b'\n'
+
+
+def _shard_id(guild_id: int, shard_count: int) -> int:
+    return (guild_id >> 22) % shard_count
+
+
+class _Connection:
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+
+        self.reader = reader
+        self.writer = writer
+        self.lock = asyncio.Lock()
+
+        self.shard_ids = set()
+        self.shard_count = 1
+
+        self.guilds = set()
+
+    @property
+    def is_connected(self) -> bool:
+        return not self.writer.is_closing()
+
+    async def write(self, **data) -> None:
+
+        self.writer.write(_encode(**data))
+        async with self.lock:
+            await self.writer.drain()
+
+
+class ClusterServer:
+
+    def __init__(self, client, path: str):
+
+        self.client = client
+        self.bot = self.client.bot
+        self.path = path
+
+        self.server = None
+        self.connections = []
+
+        self.placements = {}
+        self.counts = collections.Counter()
+        self.voice_updates = {}
+
+    def __repr__(self):
+        return f'<DioriteClusterServer path=\'{self.path}\' worker_count={len(self.connections)} ' \
+               f'player_count={len(self.placements)}>'
+
+    async def start(self) -> None:
+
+        self.server = await asyncio.start_unix_server(self._handle_connection, path=self.path, limit=STREAM_LIMIT)
+        __log__.info(f'Cluster server is listening on \'{self.path}\'.')
+
+    async def close(self) -> None:
+
+        if self.server is None:
+            return
+
+        self.server.close()
+        for connection in self.connections:
+            connection.writer.close()
+
+        await self.server.wait_closed()
+        __log__.info(f'Cluster server on \'{self.path}\' has closed.')
+
+    async def _place(self, guild_id: int, payload: dict) -> Node:
+
+        node = self.placements.get(guild_id)
+        if node is not None and node.identifier in self.client.nodes and node.available:
+            return node
+
+        moved = node is not None
+        node = self.client.get_node(role=Node.PLAYBACK)
+        self._set_placement(guild_id, node)
+
+        __log__.debug(f'Cluster placed guild \'{guild_id}\' on node \'{node.identifier}\'.')
+
+        # The worker's player has already sent its voice update and will not send it again for the same session, so
+        # the new node is given the last one the coordinator saw to be able to connect to voice.
+        voice_update = self.voice_updates.get(guild_id)
+        if moved and voice_update is not None and payload.get('op') != 'voiceUpdate':
+            await node.websocket.send(**voice_update)
+            __log__.info(f'Cluster moved guild \'{guild_id}\' to node \'{node.identifier}\' and replayed its voice '
+                         f'update.')
+
+        return node
+
+    def _set_placement(self, guild_id: int, node: typing.Optional[Node]) -> None:
+
+        previous = self.placements.pop(guild_id, None)
+        if previous is not None:
+            self.counts[previous.identifier] -= 1
+
+        if node is not None:
+            self.placements[guild_id] = node
+            self.counts[node.identifier] += 1
+
+    async def forward(self, message: dict) -> None:
+
+        guild_id = int(message['guildId'])
+
+        for connection in self.connections:
+            if _shard_id(guild_id, connection.shard_count) in connection.shard_ids:
+                break
+        else:
+            __log__.debug(f'Cluster has no worker for guild \'{guild_id}\' | {message}')
+            return
+
+        try:
+            await connection.write(op='frame', payload=message)
+        except ConnectionError:
+            __log__.warning(f'Cluster failed to forward payload for guild \'{guild_id}\' to its worker.')
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+
+        connection = _Connection(reader, writer)
+        self.connections.append(connection)
+
+        try:
+            while True:
+
+                line = await reader.readline()
+                if not line:
+                    break
+
+                await self._handle_message(connection, json.loads(line))
+
+        except (ConnectionError, asyncio.IncompleteReadError) as error:
+            __log__.warning(f'Cluster worker connection was lost.\n\n{error}')
+
+        finally:
+            self.connections.remove(connection)
+            writer.close()
+            __log__.info(f'Cluster worker for shards {sorted(connection.shard_ids)} has disconnected.')
+
+            await self._release(connection)
+
+    async def _release(self, connection: _Connection) -> None:
+        # Nothing is left to control the players of a worker that went away, so they are destroyed rather than left
+        # taking up lavalink player slots and skewing placement.
+
+        for guild_id in connection.guilds:
+
+            node = self.placements.get(guild_id)
+            self._set_placement(guild_id, None)
+            self.voice_updates.pop(guild_id, None)
+
+            if node is None or not node.available:
+                continue
+
+            try:
+                await node.websocket.send(op='destroy', guildId=str(guild_id))
+            except exceptions.NodeException as error:
+                __log__.warning(f'Cluster failed to destroy player for guild \'{guild_id}\' | {error}')
+
+        __log__.info(f'Cluster released {len(connection.guilds)} players of a disconnected worker.')
+        connection.guilds.clear()
+
+    async def _handle_message(self, connection: _Connection, message: dict) -> None:
+
+        op = message.get('op')
+
+        if op == 'identify':
+
+            connection.shard_count = message.get('shard_count') or 1
+            connection.shard_ids = set(message.get('shard_ids') or range(connection.shard_count))
+            __log__.info(f'Cluster worker for shards {sorted(connection.shard_ids)} has identified.')
+
+        elif op == 'frame':
+
+            payload = message['payload']
+            guild_id = int(payload['guildId'])
+
+            try:
+                node = await self._place(guild_id, payload)
+                await node.websocket.send(**payload)
+            except exceptions.NodeException as error:
+                __log__.warning(f'Cluster failed to send payload for guild \'{guild_id}\' | {error}')
+                return
+
+            if payload.get('op') == 'destroy':
+                self._set_placement(guild_id, None)
+                self.voice_updates.pop(guild_id, None)
+                connection.guilds.discard(guild_id)
+            else:
+                connection.guilds.add(guild_id)
+
+            if payload.get('op') == 'voiceUpdate':
+                self.voice_updates[guild_id] = payload
+
+        elif op == 'loadtracks':
+            self.bot.loop.create_task(self._load_tracks(connection, message['nonce'], message['query']))
+
+        else:
+            __log__.warning(f'Cluster received unknown payload from worker | {message}')
+
+    async def _load_tracks(self, connection: _Connection, nonce: int, query: str) -> None:
+
+        try:
+            data = await self.client.get_node(role=Node.SEARCH)._load_tracks(query)
+        except Exception as error:
+            __log__.error(f'Cluster failed to load tracks for query \'{query}\' | {error}')
+            await connection.write(op='response', nonce=nonce, error=str(error))
+        else:
+            await connection.write(op='response', nonce=nonce, data=data)
+
+
+class ClusterWebSocket(WebSocket):
+
+    def __init__(self, node):
+        super().__init__(node)
+
+        self.path = self.node.host
+
+        self.reader = None
+        self.writer = None
+        self.lock = asyncio.Lock()
+
+        self.nonces = itertools.count()
+        self.requests = {}
+
+    @property
+    def is_connected(self) -> bool:
+        return self.writer is not None and not self.writer.is_closing()
+
+    @property
+    def shard_ids(self) -> typing.List[int]:
+
+        if isinstance(self.bot, commands.AutoShardedBot):
+            return list(self.bot.shard_ids or range(self.bot.shard_count or 1))
+
+        return [self.bot.shard_id or 0]
+
+    async def connect(self) -> None:
+
+        await self.bot.wait_until_ready()
+
+        try:
+            self.reader, self.writer = await asyncio.open_unix_connection(self.path, limit=STREAM_LIMIT)
+        except OSError as error:
+            msg = f'Cluster node \'{self.node.identifier}\' was unable to connect to \'{self.path}\'.\n\n{error}'
+            __log__.error(msg)
+            raise exceptions.NodeConnectionError(msg)
+
+        await self._write(op='identify', shard_ids=self.shard_ids, shard_count=self.bot.shard_count or 1)
+
+        self.task = self.bot.loop.create_task(self.listen())
+        self.node.available = True
+
+    async def close(self) -> None:
+
+        if self.task is not None:
+            self.task.cancel()
+
+        if self.writer is not None:
+            self.writer.close()
+
+        __log__.info(f'Cluster node \'{self.node.identifier}\' has closed its connection to \'{self.path}\'.')
+
+    async def listen(self) -> None:
+
+        try:
+            while True:
+
+                line = await self.reader.readline()
+                if not line:
+                    break
+
+                message = json.loads(line)
+                op = message.get('op')
+
+                if op == 'frame':
+                    await self._handle_payload(message['payload'])
+
+                elif op == 'response':
+                    future = self.requests.pop(message['nonce'], None)
+                    if future is not None and not future.done():
+                        future.set_result(message)
+
+                else:
+                    __log__.warning(f'Cluster node \'{self.node.identifier}\' received unknown payload | {message}')
+
+        finally:
+            self.node.available = False
+            for future in self.requests.values():
+                if not future.done():
+                    future.set_exception(exceptions.NodeNotAvailable(
+                        f'Cluster node \'{self.node.identifier}\' lost its connection.'))
+            self.requests.clear()
+
+        msg = f'Cluster node \'{self.node.identifier}\' has lost its connection to \'{self.path}\'.'
+        __log__.error(msg)
+        raise exceptions.NodeConnectionError(msg)
+
+    async def _write(self, **data) -> None:
+
+        self.writer.write(_encode(**data))
+        async with self.lock:
+            await self.writer.drain()
+
+    async def send(self, **data) -> None:
+
+        if not self.is_connected:
+            raise exceptions.NodeNotAvailable(f'Node \'{self.node.identifier}\' is not currently available.')
+
+        await self._write(op='frame', payload=data)
+
+        if self.client.recorder is not None:
+            self.client.recorder.record('out', self.node.identifier, data)
+
+        __log__.debug(f'Node \'{self.node.identifier}\' has sent payload | {data}')
+
+    async def request(self, op: str, **data) -> dict:
+
+        if not self.is_connected:
+            raise exceptions.NodeNotAvailable(f'Node \'{self.node.identifier}\' is not currently available.')
+
+        nonce = next(self.nonces)
+        future = self.bot.loop.create_future()
+        self.requests[nonce] = future
+
+        try:
+            await self._write(op=op, nonce=nonce, **data)
+            return await future
+        finally:
+            self.requests.pop(nonce, None)
+
+
+class ClusterTrackStream(TrackStream):
+    # Responses come back from the cluster server in one message, so the tracks are yielded from the whole body
+    # rather than parsed incrementally.
+
+    async def _iterate(self) -> typing.AsyncIterator[objects.Track]:
+
+        data = await self.node._load_tracks(self.query)
+
+        self.load_type = data.get('loadType')
+        self.playlist_info = data.get('playlistInfo')
+        self.exception = data.get('exception')
+
+        tracks = [self.node._build_track(track) for track in data.get('tracks') or []]
+        self.node._index_tracks(tracks)
+
+        for track in tracks:
+            self.track_count += 1
+            yield track
+
+        self._complete()
+
+
+class ClusterNode(Node):
+
+    def __init__(self, client, path: str, identifier: str = 'cluster', stats_history: int = 720):
+        super().__init__(client=client, host=path, port='', password='', identifier=identifier, secure=False,
+                         stats_history=stats_history)
+
+    def __repr__(self):
+        return f'<DioriteClusterNode player_count={len(self.players.keys())} identifier=\'{self.identifier}\' ' \
+               f'path=\'{self.host}\' available={self.available}>'
+
+    @property
+    def rest_uri(self) -> str:
+        raise exceptions.NodeNotAvailable(f'Cluster node \'{self.identifier}\' has no REST endpoint, tracks are '
+                                          f'loaded through the cluster server.')
+
+    async def connect(self) -> None:
+
+        self.websocket = ClusterWebSocket(node=self)
+        await self.websocket.connect()
+        __log__.info(f'Cluster node \'{self.identifier}\' is connected to \'{self.host}\'.')
+
+    async def _load_tracks(self, query: str) -> dict:
+
+        response = await self.websocket.request('loadtracks', query=query)
+
+        if 'error' in response:
+            msg = f'Cluster node \'{self.identifier}\' failed to load tracks for query \'{query}\'.'
+            __log__.error(msg)
+            raise exceptions.TrackLoadError(msg, {'severity': 'FAULT', 'message': response['error']})
+
+        return response['data']
+
+    def stream_tracks(self, query: str, chunk_size: int = 65536) -> TrackStream:
+        return ClusterTrackStream(node=self, query=query, chunk_size=chunk_size)
@@ -24,6 +24,14 @@ class NodesNotAvailable(NodeException):
     pass
 
 
+class PlayerException(DioriteException):
+    pass
+
+
+class PlayerConnectionError(PlayerException):
+    pass
+
+
 class TrackException(DioriteException):
     pass
 
@@ -0,0 +1,144 @@
+import bisect
+import collections
+import re
+import typing
+
+from . import objects
+
+WORD_REGEX = re.compile(r'\w+')
+
+
+class PrefixIndex:
+
+    def __init__(self, size: int = 10000, max_words: int = 8, table: objects.TrackTable = None):
+
+        if size <= 0:
+            raise ValueError('PrefixIndex size must be more than 0.')
+
+        self.size = size
+        self.max_words = max_words
+        self.table = table
+
+        # Only the raw track data is kept so that the index does not hold on to Track objects the TrackTable would
+        # otherwise let go of, search builds them again through the table when it needs them.
+        self.keys = []
+        self.tracks = collections.OrderedDict()
+
+        # New keys are collected and sorted into the key list once before the next search instead of being inserted
+        # one at a time, and keys of evicted tracks are only dropped once enough of them have piled up.
+        self.pending = []
+        self.stale = 0
+
+    def __repr__(self):
+        return f'<DioritePrefixIndex size={self.size} track_count={len(self.tracks)}>'
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def __contains__(self, track_id: str):
+        return track_id in self.tracks
+
+    @staticmethod
+    def _normalise(text: str) -> str:
+        return ' '.join(text.casefold().split())
+
+    def _keys(self, info: dict) -> typing.FrozenSet[str]:
+        # Every word of the title starts a key as well so that 'gonna' finds 'Never Gonna Give You Up'.
+
+        keys = set()
+
+        for text in (info.get('title'), info.get('author')):
+
+            if not text:
+                continue
+
+            text = self._normalise(text)
+            keys.add(text)
+
+            for count, match in enumerate(WORD_REGEX.finditer(text)):
+                if count >= self.max_words:
+                    break
+                keys.add(text[match.start():])
+
+        return frozenset(keys)
+
+    def add(self, track: objects.Track) -> None:
+        self.add_many((track,))
+
+    def add_many(self, tracks: typing.Iterable[objects.Track]) -> None:
+
+        for track in tracks:
+
+            if track.track_id in self.tracks:
+                self.tracks.move_to_end(track.track_id)
+                continue
+
+            keys = self._keys(track.info)
+            self.pending.extend((key, track.track_id) for key in keys)
+            self.tracks[track.track_id] = (track.info, keys)
+
+        while len(self.tracks) > self.size:
+            self._evict()
+
+    def _evict(self) -> None:
+
+        _, (_, keys) = self.tracks.popitem(last=False)
+        self.stale += len(keys)
+
+    def remove(self, track_id: str) -> None:
+
+        if track_id not in self.tracks:
+            return
+
+        self.tracks.move_to_end(track_id, last=False)
+        self._evict()
+
+    def _is_valid(self, key: str, track_id: str) -> bool:
+
+        entry = self.tracks.get(track_id)
+        return entry is not None and key in entry[1]
+
+    def _merge(self) -> None:
+
+        if self.stale > len(self.keys) // 4:
+            # A track evicted and added again has its keys in the list twice, the set drops the duplicates.
+            self.keys = sorted({entry for entry in self.keys + self.pending if self._is_valid(*entry)})
+            self.stale = 0
+
+        elif self.pending:
+            # The key list is already sorted, so sort only has to merge the new run into it.
+            self.pending.sort()
+            self.keys.extend(self.pending)
+            self.keys.sort()
+
+        self.pending = []
+
+    def search(self, prefix: str, limit: int = 10) -> typing.List[objects.Track]:
+
+        prefix = self._normalise(prefix)
+        if not prefix:
+            return []
+
+        if self.pending or self.stale:
+            self._merge()
+
+        build = self.table.get if self.table is not None else objects.Track
+
+        results = []
+        seen = set()
+
+        position = bisect.bisect_left(self.keys, (prefix,))
+        while position < len(self.keys) and len(results) < limit:
+
+            key, track_id = self.keys[position]
+            if not key.startswith(prefix):
+                break
+
+            if track_id not in seen and self._is_valid(key, track_id):
+                seen.add(track_id)
+                results.append(build(track_id=track_id, info=self.tracks[track_id][0]))
+                self.tracks.move_to_end(track_id)
+
+            position += 1
+
+        return results
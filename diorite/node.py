@@ -1,15 +1,23 @@
+import asyncio
 import logging
-from typing import List, Union
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Union
 from urllib.parse import quote
 
-from . import exceptions, objects, websocket
+import aiohttp
+
+from . import exceptions, objects, stream, websocket
 
 __log__ = logging.getLogger(__name__)
 
 
 class Node:
 
-    def __init__(self, client, host: str, port: str, password: str, identifier: str, secure: bool):
+    SEARCH = 'search'
+    PLAYBACK = 'playback'
+
+    def __init__(self, client, host: str, port: str, password: str, identifier: str, secure: bool,
+                 stats_history: int = 720, roles: Iterable[str] = (SEARCH, PLAYBACK)):
 
         self.client = client
         self.bot = self.client.bot
@@ -21,22 +29,39 @@ class Node:
         self.identifier = identifier
         self.secure = secure
 
+        self.roles = frozenset(roles)
+        if not self.roles or not self.roles <= {self.SEARCH, self.PLAYBACK}:
+            raise exceptions.NodeCreationError(f'Node roles must be one or both of {self.SEARCH!r} and '
+                                               f'{self.PLAYBACK!r}, not {sorted(self.roles)!r}.')
+
         self.available = False
+        self.connecting = False
         self.stats = None
+        self.stats_history = objects.StatsHistory(size=stats_history)
+        self.clock = objects.Clock()
 
         self.websocket = None
         self.task = None
 
         self.players = {}
+        self.requests = 0
 
     def __repr__(self):
         return f'<DioriteNode player_count={len(self.players.keys())} identifier=\'{self.identifier}\' ' \
-               f'available={self.available}>'
+               f'available={self.available} connecting={self.connecting} roles={sorted(self.roles)}>'
 
     @property
     def is_available(self) -> bool:
+
+        if self.websocket is None:
+            return self.available and self.is_rest_only
+
         return self.websocket.is_connected and self.available
 
+    @property
+    def is_rest_only(self) -> bool:
+        return self.PLAYBACK not in self.roles
+
     @property
     def rest_uri(self) -> str:
         secure = 'https' if self.secure else 'http'
@@ -44,29 +69,151 @@ class Node:
 
     async def connect(self) -> None:
 
+        if self.is_rest_only:
+            await self._probe()
+            self.available = True
+            __log__.info(f'Node \'{self.identifier}\' is search only and will not open a websocket.')
+            return
+
         self.websocket = websocket.WebSocket(node=self)
         await self.websocket.connect()
         __log__.info(f'Websocket for node \'{self.identifier}\' is connected.')
 
-    async def disconnect(self) -> None:
+    async def _probe(self) -> None:
+        # Search only nodes never open a websocket, so this is the only chance to find out that one is unreachable or
+        # has the wrong password before get_node starts handing it out.
+
+        try:
+            async with self.session.get(url=f'{self.rest_uri}version', headers={'Authorization': self.password},
+                                        timeout=aiohttp.ClientTimeout(total=10)) as response:
+                status = response.status
+        except (aiohttp.ClientError, OSError, asyncio.TimeoutError) as error:
+            msg = f'Node \'{self.identifier}\' was unable to connect.\n\n{error}'
+            __log__.error(msg)
+            raise exceptions.NodeConnectionError(msg)
+
+        if status in (401, 403):
+            msg = f'Node \'{self.identifier}\' had invalid authorization.'
+            __log__.error(msg)
+            raise exceptions.NodeConnectionError(msg)
+
+        if status >= 500:
+            msg = f'Node \'{self.identifier}\' was unable to connect, it responded with status {status}.'
+            __log__.error(msg)
+            raise exceptions.NodeConnectionError(msg)
+
+    async def destroy_players(self, concurrency: int = 50, leave_voice: bool = True) -> None:
+        # Gateway voice state frames are limited to 120 per minute per shard, so the destroy frames are all sent to
+        # lavalink first and the voice channels are left afterwards, one at a time, in the background.
+
+        semaphore = asyncio.Semaphore(concurrency)
+        players = list(self.players.values())
+
+        async def destroy(player) -> None:
+
+            async with semaphore:
+                try:
+                    await self.websocket.send(op='destroy', guildId=str(player.guild.id))
+                except Exception as error:
+                    __log__.warning(f'Node \'{self.identifier}\' failed to destroy player \'{player.guild.id}\' | '
+                                    f'{error!r}')
+
+            player.current = None
+            self.client._remove_player(player)
+
+        await asyncio.gather(*(destroy(player) for player in players))
+        __log__.info(f'Node \'{self.identifier}\' destroyed {len(players)} players.')
+
+        connected = [player for player in players if player.is_connected]
+        if leave_voice and connected:
+            self.bot.loop.create_task(self._leave_voice(connected))
+
+    async def _leave_voice(self, players: List[Any]) -> None:
+
+        for player in players:
+            try:
+                await player.disconnect()
+            except Exception as error:
+                __log__.warning(f'Player \'{player.guild.id}\' failed to leave its voice channel | {error!r}')
 
-        for player in self.players.copy().values():
-            __log__.info(f'Node \'{self.identifier}\' destroyed player \'{player.guild.id}\'')
-            await player.destroy()
+    async def broadcast(self, predicate: Optional[Callable[..., bool]], operation: Callable[..., Awaitable[Any]],
+                        concurrency: int = 50) -> Dict[int, Any]:
+
+        # A predicate that raises for a player is reported as that player's result, like a failed operation, rather
+        # than stopping the broadcast for every other player.
+        players = []
+        results = {}
+
+        for player in list(self.players.values()):
+            try:
+                if predicate is None or predicate(player):
+                    players.append(player)
+            except Exception as error:
+                results[player.guild.id] = error
+
+        if results:
+            __log__.warning(f'Node \'{self.identifier}\' broadcast predicate failed for {len(results)} players.')
+
+        if not players:
+            return results
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(player) -> Any:
+            async with semaphore:
+                return await operation(player)
+
+        outcomes = await asyncio.gather(*(run(player) for player in players), return_exceptions=True)
+
+        failed = sum(isinstance(outcome, Exception) for outcome in outcomes)
+        __log__.info(f'Node \'{self.identifier}\' broadcast to {len(players)} players, {failed} failed.')
+
+        results.update({player.guild.id: outcome for player, outcome in zip(players, outcomes)})
+        return results
+
+    def positions(self, now: float = None) -> Dict[int, float]:
+
+        now = time.monotonic() * 1000 if now is None else now
+        return {guild_id: player._position(now) for guild_id, player in self.players.items()}
+
+    async def disconnect(self, concurrency: int = 50, leave_voice: bool = True) -> None:
 
         try:
-            self.websocket.task.cancel()
-        except Exception:  # TODO Figure out what exception would be suitable here.
-            pass
+            await self.destroy_players(concurrency=concurrency, leave_voice=leave_voice)
+        finally:
+            if self.websocket is not None:
+                await self.websocket.close()
 
-        del self.client.nodes[self.identifier]
+            self.available = False
+            self.client.nodes.pop(self.identifier, None)
 
-    async def get_tracks(self, query: str) -> Union[objects.Playlist, List[objects.Track], None]:
+    def _build_track(self, track: dict) -> objects.Track:
+
+        if self.client.tracks is not None:
+            track = self.client.tracks.get(track_id=track.get('track'), info=track.get('info'))
+        else:
+            track = objects.Track(track_id=track.get('track'), info=track.get('info'))
+
+        return track
+
+    def _index_tracks(self, tracks: List[objects.Track]) -> None:
+
+        if self.client.index is not None:
+            self.client.index.add_many(tracks)
+
+    async def _load_tracks(self, query: str) -> dict:
 
-        async with self.client.session.get(url=f'{self.rest_uri}/loadtracks?identifier={quote(query)}',
-                                           headers={'Authorization': self.password}) as response:
-            data = await response.json()
+        self.requests += 1
+        try:
+            async with self.client.session.get(url=f'{self.rest_uri}/loadtracks?identifier={quote(query)}',
+                                               headers={'Authorization': self.password}) as response:
+                return await response.json()
+        finally:
+            self.requests -= 1
+
+    async def get_tracks(self, query: str) -> Union[objects.Playlist, List[objects.Track], None]:
 
+        data = await self._load_tracks(query)
         load_type = data.get('loadType')
 
         if load_type == 'LOAD_FAILED':
@@ -81,8 +228,18 @@ class Node:
 
         elif load_type == 'PLAYLIST_LOADED':
             __log__.info(f'Node \'{self.identifier}\' found playlist for query \'{query}\'.')
-            return objects.Playlist(playlist_info=data.get('playlistInfo'), tracks=data.get('tracks'))
+            playlist = objects.Playlist(playlist_info=data.get('playlistInfo'), tracks=data.get('tracks'),
+                                        table=self.client.tracks)
+
+            self._index_tracks(playlist.tracks)
+            return playlist
 
         elif load_type == 'SEARCH_RESULT' or load_type == 'TRACK_LOADED':
             __log__.info(f'Node \'{self.identifier}\' found tracks for query \'{query}\'.')
-            return [objects.Track(track_id=track.get('track'), info=track.get('info')) for track in data.get('tracks')]
+            tracks = [self._build_track(track) for track in data.get('tracks')]
+
+            self._index_tracks(tracks)
+            return tracks
+
+    def stream_tracks(self, query: str, chunk_size: int = 65536) -> stream.TrackStream:
+        return stream.TrackStream(node=self, query=query, chunk_size=chunk_size)
@@ -1,13 +1,20 @@
+import array
 import collections
+import math
 import re
+import time
+import typing
+import weakref
 
 from . import exceptions
 
+YT_ID_REGEX = re.compile(r'^[a-zA-Z0-9_-]{11}$')
+
 
 class Track:
 
     __slots__ = ('track_id', 'info', 'identifier', 'is_seekable', 'author', 'length',
-                 'is_stream', 'position', 'title', 'uri')
+                 'is_stream', 'position', 'title', 'uri', '_yt_id', '__weakref__')
 
     def __init__(self, track_id: str, info: dict):
 
@@ -23,6 +30,8 @@ class Track:
         self.title = info.get('title')
         self.uri = info.get('uri')
 
+        self._yt_id = self.identifier if self.identifier and YT_ID_REGEX.match(self.identifier) else None
+
     def __str__(self):
         return self.title
 
@@ -31,23 +40,58 @@ class Track:
 
     @property
     def yt_id(self):
-        return self.identifier if re.match(r'^[a-zA-Z0-9_-]{11}$', self.identifier) else None
+        return self._yt_id
 
     @property
     def thumbnail(self):
         return f'https://img.youtube.com/vi/{self.identifier}/mqdefault.jpg' if self.yt_id else None
 
 
+class TrackTable:
+
+    __slots__ = ('tracks',)
+
+    def __init__(self):
+        self.tracks = weakref.WeakValueDictionary()
+
+    def __repr__(self):
+        return f'<DioriteTrackTable track_count={len(self.tracks)}>'
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def __contains__(self, track_id: str):
+        return track_id in self.tracks
+
+    def get(self, track_id: str, info: dict) -> Track:
+
+        track = self.tracks.get(track_id)
+        if track is None:
+            track = Track(track_id=track_id, info=info)
+            self.tracks[track_id] = track
+
+        return track
+
+    def intern(self, track: Track) -> Track:
+        # Subclasses can carry per-guild state such as the requester, so only plain tracks are ever shared.
+
+        if type(track) is not Track:
+            return track
+
+        return self.tracks.setdefault(track.track_id, track)
+
+
 class Playlist:
 
     __slots__ = ('playlist_info', 'raw_tracks', 'tracks', 'name', 'selected_track')
 
-    def __init__(self, playlist_info: dict, tracks: list):
+    def __init__(self, playlist_info: dict, tracks: list, table: 'TrackTable' = None):
 
         self.playlist_info = playlist_info
         self.raw_tracks = tracks
 
-        self.tracks = [Track(track_id=track.get('track'), info=track.get('info')) for track in self.raw_tracks]
+        build = table.get if table is not None else Track
+        self.tracks = [build(track_id=track.get('track'), info=track.get('info')) for track in self.raw_tracks]
 
         self.name = self.playlist_info.get('name')
         self.selected_track = self.playlist_info.get('selectedTrack')
@@ -91,6 +135,159 @@ class Stats:
         return f'<DioriteStats active_players={self.active_players} players={self.players}>'
 
 
+class StatsHistory:
+
+    __slots__ = ('size', 'count', 'index', 'timestamps', 'fields')
+
+    FIELDS = ('active_players', 'players', 'uptime', 'memory_reservable', 'memory_allocated', 'memory_used',
+              'memory_free', 'cpu_system_load', 'cpu_lavalink_load', 'cpu_cores', 'frames_sent',
+              'frames_nulled', 'frames_deficit')
+
+    def __init__(self, size: int = 720):
+
+        if size <= 0:
+            raise ValueError('StatsHistory size must be more than 0.')
+
+        self.size = size
+        self.count = 0
+        self.index = 0
+
+        self.timestamps = array.array('d', bytes(8 * size))
+        self.fields = {field: array.array('d', bytes(8 * size)) for field in self.FIELDS}
+
+    def __repr__(self):
+        return f'<DioriteStatsHistory size={self.size} count={self.count}>'
+
+    def __len__(self):
+        return self.count
+
+    def append(self, stats: Stats, timestamp: float = None) -> None:
+
+        index = self.index
+
+        # Stats uses -1 for the memory, cpu and frame stats lavalink left out, those are stored as nan so that the
+        # aggregates skip them instead of treating them as real samples.
+        self.timestamps[index] = time.monotonic() if timestamp is None else timestamp
+        for field, values in self.fields.items():
+            value = getattr(stats, field)
+            values[index] = math.nan if value < 0 else value
+
+        self.index = (index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def _window(self, window: float = None) -> typing.Tuple[int, int]:
+        # Returns the ring position of the oldest sample inside the window and the number of samples in it.
+
+        if not self.count:
+            return 0, 0
+
+        newest = (self.index - 1) % self.size
+        if window is None:
+            return (self.index - self.count) % self.size, self.count
+
+        cutoff = self.timestamps[newest] - window
+        count = 0
+        position = newest
+
+        while count < self.count and self.timestamps[position] >= cutoff:
+            count += 1
+            position = (position - 1) % self.size
+
+        return (newest - count + 1) % self.size, count
+
+    def _samples(self, field: str, window: float = None) -> typing.Iterator[typing.Tuple[float, float]]:
+
+        values = self.fields[field]
+        start, count = self._window(window)
+
+        for offset in range(count):
+            position = (start + offset) % self.size
+            value = values[position]
+            if not math.isnan(value):
+                yield self.timestamps[position], value
+
+    def _values(self, field: str, window: float = None) -> typing.Iterator[float]:
+        return (value for _, value in self._samples(field, window))
+
+    @property
+    def latest(self) -> typing.Optional[typing.Dict[str, float]]:
+
+        if not self.count:
+            return None
+
+        newest = (self.index - 1) % self.size
+        latest = {field: values[newest] for field, values in self.fields.items()}
+
+        return {field: None if math.isnan(value) else value for field, value in latest.items()}
+
+    def mean(self, field: str, window: float = None) -> typing.Optional[float]:
+
+        total = 0.0
+        count = 0
+        for value in self._values(field, window):
+            total += value
+            count += 1
+
+        return total / count if count else None
+
+    def max(self, field: str, window: float = None) -> typing.Optional[float]:
+        return max(self._values(field, window), default=None)
+
+    def min(self, field: str, window: float = None) -> typing.Optional[float]:
+        return min(self._values(field, window), default=None)
+
+    def rate(self, field: str, window: float = None) -> typing.Optional[float]:
+        # Frame stats are reported by lavalink as per minute averages, so the rate is the time weighted average of
+        # those samples across the window rather than a difference between the first and last values.
+
+        first = previous = value = None
+        total = 0.0
+
+        for timestamp, value in self._samples(field, window):
+            if previous is None:
+                first = timestamp
+            else:
+                total += value * (timestamp - previous)
+            previous = timestamp
+
+        if previous is None:
+            return None
+
+        elapsed = previous - first
+        return total / elapsed if elapsed else value
+
+
+class Clock:
+
+    __slots__ = ('offset', 'samples', 'smoothing')
+
+    def __init__(self, smoothing: float = 0.05):
+
+        self.offset = None
+        self.samples = 0
+        self.smoothing = smoothing
+
+    def __repr__(self):
+        return f'<DioriteClock offset={self.offset} samples={self.samples}>'
+
+    def update(self, server_time: float, local_time: float) -> None:
+        # Each sample is the real offset minus however long the payload took to reach us, so the largest samples are
+        # the most accurate. Higher samples are taken straight away and lower ones only pull the estimate down slowly,
+        # which still lets it follow a server clock that drifts or jumps backwards.
+
+        sample = server_time - local_time
+
+        if self.offset is None or sample > self.offset:
+            self.offset = sample
+        else:
+            self.offset += (sample - self.offset) * self.smoothing
+
+        self.samples += 1
+
+    def to_local(self, server_time: float) -> float:
+        return server_time - self.offset
+
+
 class Filter:
 
     __slots__ = 'payload'
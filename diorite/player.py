@@ -1,3 +1,5 @@
+import asyncio
+import enum
 import logging
 import time
 import typing
@@ -12,6 +14,12 @@ from .node import Node
 __log__ = logging.getLogger(__name__)
 
 
+class VoiceStatus(enum.Enum):
+    DISCONNECTED = 'disconnected'
+    CONNECTING = 'connecting'
+    CONNECTED = 'connected'
+
+
 class Player:
 
     def __init__(self, node: Node, guild: discord.Guild, **kwargs):
@@ -29,15 +37,27 @@ class Player:
         self.equalizer = objects.Equalizer.flat()
 
         self.voice_state = {}
+        self.voice_status = VoiceStatus.DISCONNECTED
         self.player_state = {}
 
+        self._voice_key = None
+        self._voice_ready = asyncio.Event()
+
         self.last_position = 0
         self.last_update = 0
         self.time = 0
 
+        self.last_activity = time.monotonic()
+        self.alone_since = None
+
     def __repr__(self):
         return f'<DioritePlayer is_connected={self.is_connected} is_playing={self.is_playing}>'
 
+    @property
+    def shard_id(self) -> int:
+        # Guilds of a bot that is not sharded have a shard_id of None, they are all on shard 0.
+        return self.guild.shard_id or 0
+
     @property
     def is_connected(self) -> bool:
         return self.voice_channel is not None
@@ -52,6 +72,9 @@ class Player:
 
     @property
     def position(self) -> float:
+        return self._position(time.monotonic() * 1000)
+
+    def _position(self, now: float) -> float:
 
         if not self.is_playing:
             return 0
@@ -62,7 +85,7 @@ class Player:
         if self.paused:
             return min(self.last_position, self.current.length)
 
-        difference = (time.time() * 1000) - self.last_update
+        difference = max(now - self.last_update, 0)
         position = self.last_position + difference
 
         if position > self.current.length:
@@ -73,11 +96,25 @@ class Player:
     async def _update_state(self, data: dict) -> None:
 
         state = data.get('state')
+        now = time.monotonic() * 1000
+
+        if not self.paused:
+            self._touch()
 
-        self.last_update = time.time() * 1000
         self.last_position = state.get('position', 0)
         self.time = state.get('time', 0)
 
+        # The position was measured when lavalink sent the update, so it is anchored to that moment on the local
+        # clock rather than to when the event loop got round to processing it.
+        if self.time:
+            self.node.clock.update(self.time, now)
+            self.last_update = min(self.node.clock.to_local(self.time), now)
+        else:
+            self.last_update = now
+
+    def _touch(self) -> None:
+        self.last_activity = time.monotonic()
+
     async def _voice_server_update(self, data: dict) -> None:
 
         __log__.debug(f'Player \'{self.guild.id}\' received a voice server update | {data}')
@@ -93,17 +130,45 @@ class Player:
         channel_id = data['channel_id']
         if not channel_id:
             self.voice_state.clear()
+            self._reset_voice()
             return
 
         self.voice_channel = self.bot.get_channel(int(channel_id))
         await self._dispatch_voice_update()
 
+    def _reset_voice(self) -> None:
+
+        self.voice_status = VoiceStatus.DISCONNECTED
+        self._voice_key = None
+        self._voice_ready.clear()
+
     async def _dispatch_voice_update(self) -> None:
 
-        __log__.debug(f'Player \'{self.guild.id}\' has dispatched a voice update.')
+        if {'sessionId', 'event'} != self.voice_state.keys():
+            return
 
-        if {'sessionId', 'event'} == self.voice_state.keys():
+        # Discord sends a null endpoint while the voice server is being reallocated, a usable one will follow.
+        event = self.voice_state['event']
+        if not event.get('endpoint'):
+            return
+
+        key = (self.voice_state['sessionId'], event.get('endpoint'), event.get('token'))
+        if key != self._voice_key:
             await self.node.websocket.send(op='voiceUpdate', guildId=str(self.guild.id), **self.voice_state)
+            self._voice_key = key
+            __log__.debug(f'Player \'{self.guild.id}\' has dispatched a voice update.')
+
+        self.voice_status = VoiceStatus.CONNECTED
+        self._voice_ready.set()
+
+    async def wait_until_connected(self, timeout: float = None) -> None:
+
+        try:
+            await asyncio.wait_for(self._voice_ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            msg = f'Player \'{self.guild.id}\' did not finish connecting to voice within {timeout} seconds.'
+            __log__.warning(msg)
+            raise exceptions.PlayerConnectionError(msg)
 
     def _get_shard_socket(self, shard_id: int) -> typing.Optional[DiscordWebSocket]:
 
@@ -113,10 +178,19 @@ class Player:
         if self.bot.shard_id is None or self.bot.shard_id == shard_id:
             return self.bot.ws
 
-    async def connect(self, voice_channel: discord.VoiceChannel) -> None:
+    async def connect(self, voice_channel: discord.VoiceChannel, timeout: float = 10, wait: bool = True) -> None:
 
         self.voice_channel = voice_channel
-        await self._get_shard_socket(self.guild.shard_id).voice_state(self.guild.id, str(voice_channel.id))
+        self._touch()
+
+        if self.voice_status is VoiceStatus.DISCONNECTED:
+            self.voice_status = VoiceStatus.CONNECTING
+            self._voice_ready.clear()
+
+        await self._get_shard_socket(self.shard_id).voice_state(self.guild.id, str(voice_channel.id))
+
+        if wait:
+            await self.wait_until_connected(timeout=timeout)
 
         __log__.info(f'Player \'{self.guild.id}\' has connected to voice channel \'{self.voice_channel.id}\'.')
 
@@ -125,12 +199,18 @@ class Player:
         __log__.info(f'Player \'{self.guild.id}\' has disconnected from voice channel \'{self.voice_channel.id}\'.')
 
         self.voice_channel = None
-        await self._get_shard_socket(self.guild.shard_id).voice_state(self.guild.id, None)
+        self._reset_voice()
+        await self._get_shard_socket(self.shard_id).voice_state(self.guild.id, None)
 
     async def play(self, track: objects.Track, no_replace: bool = False, start: int = 0, end: int = 0):
 
+        if self.node.client.tracks is not None:
+            track = self.node.client.tracks.intern(track)
+
         if no_replace is False or not self.is_playing:
             self.paused = False
+            self.last_position = start if 0 < start < track.length else 0
+            self.last_update = time.monotonic() * 1000
 
         payload = {
             'op': 'play',
@@ -145,12 +225,14 @@ class Player:
 
         await self.node.websocket.send(**payload)
         self.current = track
+        self._touch()
 
         __log__.info(f'Player \'{self.guild.id}\' has started playing track {self.current!r}.')
 
     async def stop(self) -> None:
 
         await self.node.websocket.send(op='stop', guildId=str(self.guild.id))
+        self._touch()
         __log__.info(f'Player \'{self.guild.id}\' has stopped playing track {self.current!r}.')
 
         self.current = None
@@ -163,13 +245,23 @@ class Player:
             await self.disconnect()
 
         await self.node.websocket.send(op='destroy', guildId=str(self.guild.id))
-        del self.node.players[self.guild.id]
+        self.node.client._remove_player(self)
 
         __log__.info(f'Player \'{self.guild.id}\' has been destroyed.')
 
     async def set_pause(self, pause: bool) -> None:
 
         await self.node.websocket.send(op='pause', guildId=str(self.guild.id), pause=pause)
+        self._touch()
+
+        # The position is anchored again here rather than at the next player update, pausing freezes it where it is
+        # and resuming starts counting again from now.
+        now = time.monotonic() * 1000
+        if pause and not self.paused:
+            self.last_position = self._position(now)
+        elif not pause and self.paused:
+            self.last_update = now
+
         self.paused = pause
 
         __log__.info(f'Player \'{self.guild.id}\' pause has been set to \'{self.paused}\'.')
@@ -177,6 +269,7 @@ class Player:
     async def set_volume(self, volume: int) -> None:
 
         await self.node.websocket.send(op='volume', guildId=str(self.guild.id), volume=volume)
+        self._touch()
         self.volume = volume
 
         __log__.info(f'Player \'{self.guild.id}\' volume has been set to \'{self.volume}\'.')
@@ -192,11 +285,16 @@ class Player:
             raise exceptions.TrackInvalidPosition(f'Track seek position must be between 0 and track length.')
 
         await self.node.websocket.send(op='seek', guildId=str(self.guild.id), position=position)
+        self._touch()
+
+        self.last_position = position
+        self.last_update = time.monotonic() * 1000
         __log__.info(f'Player \'{self.guild.id}\' position has been set to \'{self.position}\'.')
 
     async def set_equalizer(self, equalizer: objects.Equalizer):
 
         await self.node.websocket.send(op='equalizer', guildId=str(self.guild.id), bands=equalizer.eq)
+        self._touch()
         self.equalizer = equalizer
 
         __log__.info(f'Player \'{self.guild.id}\' equalizer has been set to {equalizer!r}.')
@@ -204,6 +302,7 @@ class Player:
     async def set_filter(self, filter_type: objects.Filter):
 
         await self.node.websocket.send(op="filters", guildId=str(self.guild.id), **filter_type.payload)
+        self._touch()
         self.filter = filter_type
 
         __log__.info(f'Player \'{self.guild.id}\'  has had {filter_type!r} filter applied.')
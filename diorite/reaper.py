@@ -0,0 +1,134 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+
+from . import exceptions
+
+__log__ = logging.getLogger(__name__)
+
+
+class Reaper:
+
+    def __init__(self, client, idle_timeout: float = None, alone_timeout: float = None):
+
+        if idle_timeout is None and alone_timeout is None:
+            raise ValueError('Reaper needs at least one of idle_timeout or alone_timeout.')
+
+        self.client = client
+        self.bot = self.client.bot
+
+        self.idle_timeout = idle_timeout
+        self.alone_timeout = alone_timeout
+
+        self.heap = []
+        self.counter = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.task = None
+
+    def __repr__(self):
+        return f'<DioriteReaper idle_timeout={self.idle_timeout} alone_timeout={self.alone_timeout} ' \
+               f'scheduled={len(self.heap)}>'
+
+    @property
+    def interval(self) -> float:
+        return min(timeout for timeout in (self.idle_timeout, self.alone_timeout) if timeout is not None)
+
+    def start(self) -> None:
+
+        if self.task is None or self.task.done():
+            self.task = self.bot.loop.create_task(self.run())
+
+    def stop(self) -> None:
+
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def schedule(self, player, deadline: float = None) -> None:
+
+        if deadline is None:
+            deadline = time.monotonic() + self.interval
+
+        if not self.heap or deadline < self.heap[0][0]:
+            self.wakeup.set()
+
+        heapq.heappush(self.heap, (deadline, next(self.counter), player))
+        self.start()
+
+    async def run(self) -> None:
+
+        while True:
+
+            if not self.heap:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                continue
+
+            delay = self.heap[0][0] - time.monotonic()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+                continue
+
+            now = time.monotonic()
+            while self.heap and self.heap[0][0] <= now:
+                _, _, player = heapq.heappop(self.heap)
+                self._check(player, now)
+
+    def _check(self, player, now: float) -> None:
+
+        # Destroyed or replaced players are dropped here rather than removed from the heap when they go away.
+        if player.node.players.get(player.guild.id) is not player:
+            return
+
+        deadlines = []
+
+        if self.idle_timeout is not None:
+
+            deadline = player.last_activity + self.idle_timeout
+            if deadline <= now:
+                self._reap(player, 'idle')
+                return
+
+            deadlines.append(deadline)
+
+        if self.alone_timeout is not None:
+
+            channel = player.voice_channel
+            if channel is not None and not any(not member.bot for member in channel.members):
+
+                if player.alone_since is None:
+                    player.alone_since = now
+
+                deadline = player.alone_since + self.alone_timeout
+                if deadline <= now:
+                    self._reap(player, 'alone')
+                    return
+
+                deadlines.append(deadline)
+
+            else:
+                player.alone_since = None
+                deadlines.append(now + self.alone_timeout / 2)
+
+        heapq.heappush(self.heap, (min(deadlines), next(self.counter), player))
+
+    def _reap(self, player, reason: str) -> None:
+        self.bot.loop.create_task(self._destroy(player, reason))
+
+    async def _destroy(self, player, reason: str) -> None:
+
+        try:
+            await player.destroy()
+        except (exceptions.DioriteException, KeyError) as error:
+            __log__.warning(f'Reaper failed to destroy player \'{player.guild.id}\' | {error!r}')
+            self.schedule(player)
+            return
+
+        __log__.info(f'Reaper destroyed player \'{player.guild.id}\' for being {reason}.')
+        self.bot.dispatch('diorite_player_reaped', player, reason)
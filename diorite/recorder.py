@@ -0,0 +1,116 @@
+import concurrent.futures
+import gzip
+import hashlib
+import json
+import logging
+import time
+import typing
+
+__log__ = logging.getLogger(__name__)
+
+
+def open_recording(path: str, mode: str = 'r') -> typing.TextIO:
+
+    if path.endswith('.gz'):
+        return gzip.open(path, f'{mode}t', encoding='utf-8')
+
+    return open(path, mode, encoding='utf-8')
+
+
+def _redact(value: typing.Optional[str]) -> typing.Optional[str]:
+    # Hashed rather than blanked so that distinct sessions and tokens still compare as distinct when replayed.
+    return f'redacted:{hashlib.sha256(value.encode()).hexdigest()[:12]}' if value else value
+
+
+def redact(data: dict) -> dict:
+
+    if data.get('t') == 'VOICE_SERVER_UPDATE' and 'd' in data:
+        return {**data, 'd': {**data['d'], 'token': _redact(data['d'].get('token'))}}
+
+    if data.get('t') == 'VOICE_STATE_UPDATE' and 'd' in data:
+        return {**data, 'd': {**data['d'], 'session_id': _redact(data['d'].get('session_id'))}}
+
+    if data.get('op') == 'voiceUpdate':
+        event = data.get('event') or {}
+        return {**data, 'sessionId': _redact(data.get('sessionId')),
+                'event': {**event, 'token': _redact(event.get('token'))}}
+
+    return data
+
+
+def read_recording(path: str) -> typing.Iterator[list]:
+
+    with open_recording(path) as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Recorder:
+
+    def __init__(self, client, path: str, flush_size: int = 256):
+
+        self.client = client
+        self.bot = self.client.bot
+        self.path = path
+        self.flush_size = flush_size
+
+        self.file = open_recording(path, 'w')
+        self.start = time.monotonic()
+        self.count = 0
+
+        # Records are written in batches from a single thread so that the event loop never waits on the disk or on
+        # gzip, and so that the batches still land in the order they were recorded.
+        self.buffer = []
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+        self.record('header', None, {
+            'user_id': self.bot.user.id,
+            'shard_count': self.bot.shard_count or 1,
+            'nodes': list(self.client.nodes.keys())
+        })
+
+    def __repr__(self):
+        return f'<DioriteRecorder path=\'{self.path}\' count={self.count}>'
+
+    @property
+    def closed(self) -> bool:
+        return self.file.closed
+
+    def record(self, direction: str, source: typing.Optional[str], data: dict) -> None:
+
+        if self.file.closed:
+            return
+
+        offset = round(time.monotonic() - self.start, 6)
+        self.buffer.append(json.dumps([offset, direction, source, redact(data)], separators=(',', ':')) + '\n')
+        self.count += 1
+
+        if len(self.buffer) >= self.flush_size:
+            self.flush()
+
+    def _write(self, lines: typing.List[str]) -> None:
+
+        try:
+            self.file.writelines(lines)
+        except (OSError, ValueError) as error:
+            __log__.error(f'Recorder failed to write {len(lines)} records to \'{self.path}\'.\n\n{error}')
+
+    def flush(self) -> None:
+
+        if not self.buffer or self.file.closed:
+            return
+
+        lines, self.buffer = self.buffer, []
+        self.executor.submit(self._write, lines)
+
+    def close(self) -> None:
+
+        if self.file.closed:
+            return
+
+        self.flush()
+        self.executor.shutdown(wait=True)
+
+        self.file.close()
+        __log__.info(f'Recorder wrote {self.count} records to \'{self.path}\'.')
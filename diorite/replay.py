@@ -0,0 +1,223 @@
+import argparse
+import asyncio
+import collections
+import cProfile
+import logging
+import pstats
+import time
+import typing
+
+import discord
+
+from . import recorder
+from .client import Client
+from .node import Node
+from .player import Player
+from .websocket import WebSocket
+
+__log__ = logging.getLogger(__name__)
+
+
+class StubGateway:
+
+    async def voice_state(self, guild_id: int, channel_id: typing.Optional[str]) -> None:
+        pass
+
+
+class StubGuild:
+
+    def __init__(self, guild_id: int, shard_count: int = None):
+
+        self.id = guild_id
+        # Like discord.py, guilds of a bot without a shard count have no shard id.
+        self.shard_id = (guild_id >> 22) % shard_count if shard_count else None
+
+    def __repr__(self):
+        return f'<StubGuild id={self.id} shard_id={self.shard_id}>'
+
+
+class StubBot:
+
+    def __init__(self, user_id: int, shard_count: int = 1, loop=None):
+
+        self.loop = loop or asyncio.get_event_loop()
+        self.user = discord.Object(id=user_id)
+
+        self.shard_id = None
+        self.shard_count = shard_count
+        self.ws = StubGateway()
+
+        self.dispatched = collections.Counter()
+
+    def add_listener(self, func, name: str = None) -> None:
+        pass
+
+    def remove_listener(self, func, name: str = None) -> None:
+        pass
+
+    def dispatch(self, event: str, *args) -> None:
+        self.dispatched[event] += 1
+
+    def get_channel(self, channel_id: int) -> discord.Object:
+        return discord.Object(id=channel_id)
+
+    def get_guild(self, guild_id: int) -> discord.Object:
+        return discord.Object(id=guild_id)
+
+    async def wait_until_ready(self) -> None:
+        pass
+
+    def is_closed(self) -> bool:
+        return False
+
+
+class StubSession:
+
+    async def close(self) -> None:
+        pass
+
+
+class StubWebSocket(WebSocket):
+
+    def __init__(self, node):
+        super().__init__(node)
+
+        self.sent = 0
+
+    @property
+    def is_connected(self) -> bool:
+        return True
+
+    async def connect(self) -> None:
+        self.node.available = True
+
+    async def close(self) -> None:
+        pass
+
+    async def send(self, **data) -> None:
+
+        if self.client.recorder is not None:
+            self.client.recorder.record('out', self.node.identifier, data)
+
+        self.sent += 1
+
+
+class Replayer:
+
+    def __init__(self, path: str, speed: float = None, loop=None):
+
+        self.path = path
+        self.speed = speed
+        self.loop = loop or asyncio.get_event_loop()
+
+        self.records = list(recorder.read_recording(path))
+        if not self.records or self.records[0][1] != 'header':
+            raise ValueError(f'{path!r} is not a diorite recording.')
+
+        header = self.records[0][3]
+        self.shard_count = header.get('shard_count', 1)
+
+        self.bot = StubBot(user_id=header['user_id'], shard_count=self.shard_count, loop=self.loop)
+        self.client = Client(bot=self.bot, loop=self.loop, session=StubSession())
+
+        self.placements = {}
+        for _, direction, source, data in self.records:
+            if direction in ('in', 'out') and 'guildId' in data:
+                self.placements.setdefault(int(data['guildId']), source)
+
+        for identifier in header.get('nodes', []) + list(self.placements.values()):
+            if identifier not in self.client.nodes:
+                self._add_node(identifier)
+
+    def __repr__(self):
+        return f'<DioriteReplayer path=\'{self.path}\' record_count={len(self.records)} speed={self.speed}>'
+
+    def _add_node(self, identifier: str) -> Node:
+
+        node = Node(client=self.client, host='replay', port='0', password='', identifier=identifier, secure=False)
+        node.websocket = StubWebSocket(node=node)
+        node.available = True
+
+        self.client.nodes[identifier] = node
+        return node
+
+    def _player(self, guild_id: int) -> Player:
+
+        node = self.client.nodes[self.placements.get(guild_id) or next(iter(self.client.nodes))]
+
+        player = node.players.get(guild_id)
+        if player is None:
+            player = Player(node, StubGuild(guild_id, self.shard_count))
+            self.client._add_player(node, player)
+
+        return player
+
+    async def run(self) -> typing.Dict[str, typing.Any]:
+
+        counts = collections.Counter()
+        start = time.perf_counter()
+
+        for offset, direction, source, data in self.records[1:]:
+
+            if self.speed:
+                delay = offset / self.speed - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            if direction == 'in':
+                if 'guildId' in data:
+                    self._player(int(data['guildId']))
+                await self.client.nodes[source].websocket._handle_payload(data)
+
+            elif direction == 'out':
+                # Voice updates are sent again by the player while the gateway records are replayed.
+                if data.get('op') == 'voiceUpdate':
+                    continue
+                await self.client.nodes[source].websocket.send(**data)
+
+            elif direction == 'gateway':
+                self._player(int(data['d']['guild_id']))
+                await self.client._update_handler(data)
+
+            counts[direction] += 1
+
+        elapsed = time.perf_counter() - start
+        __log__.info(f'Replayed {sum(counts.values())} records from \'{self.path}\' in {elapsed:.3f} seconds.')
+
+        return {
+            'elapsed': elapsed,
+            'records': dict(counts),
+            'players': len(self.client.players),
+            'dispatched': dict(self.bot.dispatched)
+        }
+
+
+def main(argv: typing.List[str] = None) -> None:
+
+    parser = argparse.ArgumentParser(prog='python -m diorite.replay',
+                                     description='Replay a diorite traffic recording against stub nodes.')
+    parser.add_argument('path', help='path to a recording made with Client.start_recording')
+    parser.add_argument('--speed', type=float, default=None,
+                        help='replay speed relative to real time, omit to replay as fast as possible')
+    parser.add_argument('--profile', action='store_true', help='print the slowest calls made during the replay')
+    args = parser.parse_args(argv)
+
+    loop = asyncio.get_event_loop()
+    replayer = Replayer(args.path, speed=args.speed, loop=loop)
+
+    profile = cProfile.Profile() if args.profile else None
+    if profile is not None:
+        profile.enable()
+
+    result = loop.run_until_complete(replayer.run())
+
+    if profile is not None:
+        profile.disable()
+        pstats.Stats(profile).sort_stats('cumulative').print_stats(25)
+
+    for key, value in result.items():
+        print(f'{key}: {value}')
+
+
+if __name__ == '__main__':
+    main()
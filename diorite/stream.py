@@ -0,0 +1,234 @@
+import codecs
+import collections
+import json
+import logging
+import typing
+from urllib.parse import quote
+
+from . import exceptions, objects
+
+__log__ = logging.getLogger(__name__)
+
+_START, _KEY, _COLON, _VALUE, _NEXT_KEY, _ARRAY, _ELEMENT, _NEXT_ELEMENT, _END = range(9)
+_MISSING = object()
+
+
+class TrackStream:
+
+    def __init__(self, node, query: str, chunk_size: int = 65536):
+
+        self.node = node
+        self.query = query
+        self.chunk_size = chunk_size
+
+        self.load_type = None
+        self.playlist_info = None
+        self.exception = None
+        self.track_count = 0
+
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._position = 0
+        self._state = _START
+        self._key = None
+        self._tracks = collections.deque()
+        self._started = False
+
+    def __repr__(self):
+        return f'<DioriteTrackStream query={self.query!r} load_type={self.load_type} track_count={self.track_count}>'
+
+    def __aiter__(self) -> typing.AsyncIterator[objects.Track]:
+
+        if self._started:
+            raise RuntimeError('A TrackStream can only be iterated once, use Node.stream_tracks to load it again.')
+
+        self._started = True
+        return self._iterate()
+
+    @property
+    def is_playlist(self) -> bool:
+        return self.load_type == 'PLAYLIST_LOADED'
+
+    @property
+    def name(self) -> typing.Optional[str]:
+        return self.playlist_info.get('name') if self.playlist_info else None
+
+    @property
+    def selected_track(self) -> typing.Optional[int]:
+        return self.playlist_info.get('selectedTrack') if self.playlist_info else None
+
+    async def _iterate(self) -> typing.AsyncIterator[objects.Track]:
+
+        self.node.requests += 1
+        try:
+            async with self.node.session.get(url=f'{self.node.rest_uri}/loadtracks?identifier={quote(self.query)}',
+                                             headers={'Authorization': self.node.password}) as response:
+
+                decoder = codecs.getincrementaldecoder('utf-8')()
+
+                async for chunk in response.content.iter_chunked(self.chunk_size):
+                    self._feed(decoder.decode(chunk))
+                    self.node._index_tracks(self._tracks)
+                    while self._tracks:
+                        yield self._tracks.popleft()
+
+                self._feed(decoder.decode(b'', final=True), eof=True)
+                self.node._index_tracks(self._tracks)
+                while self._tracks:
+                    yield self._tracks.popleft()
+        finally:
+            self.node.requests -= 1
+
+        if self._state != _END:
+            self._fail('ended before the response was complete')
+
+        self._complete()
+
+    def _complete(self) -> None:
+
+        if self.load_type == 'LOAD_FAILED':
+            exception = self.exception or {}
+            msg = f"There was an error of severity level \'{exception.get('severity')}\' while loading a track."
+            __log__.error(msg)
+            raise exceptions.TrackLoadError(msg, exception)
+
+        elif self.load_type == 'NO_MATCHES':
+            __log__.warning(f'Node \'{self.node.identifier}\' found no result for query \'{self.query}\'.')
+
+        else:
+            __log__.info(f'Node \'{self.node.identifier}\' streamed {self.track_count} tracks for query '
+                         f'\'{self.query}\'.')
+
+    def _fail(self, reason: str) -> None:
+
+        msg = f'Node \'{self.node.identifier}\' returned a malformed loadtracks response, it {reason}.'
+        __log__.error(msg)
+        raise exceptions.TrackLoadError(msg, {'severity': 'FAULT', 'message': reason})
+
+    def _feed(self, data: str, eof: bool = False) -> None:
+
+        self._buffer = self._buffer[self._position:] + data
+        self._position = 0
+
+        while self._step(eof):
+            pass
+
+    def _skip(self) -> typing.Optional[str]:
+
+        buffer = self._buffer
+        position = self._position
+
+        while position < len(buffer) and buffer[position] in ' \t\r\n':
+            position += 1
+
+        self._position = position
+        return buffer[position] if position < len(buffer) else None
+
+    def _decode(self, eof: bool) -> typing.Any:
+        # raw_decode can not tell a truncated value from a malformed one, so until the body has been fully read a
+        # value only counts as complete once something follows it.
+
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._position)
+        except json.JSONDecodeError:
+            if eof:
+                self._fail('contained invalid json')
+            return _MISSING
+
+        if end >= len(self._buffer) and not eof:
+            return _MISSING
+
+        self._position = end
+        return value
+
+    def _expect(self, char: str, expected: str) -> None:
+
+        if char != expected:
+            self._fail(f'contained {char!r} where {expected!r} was expected')
+
+        self._position += 1
+
+    def _step(self, eof: bool) -> bool:
+
+        char = self._skip()
+        if char is None or self._state == _END:
+            return False
+
+        state = self._state
+
+        if state == _START:
+            self._expect(char, '{')
+            self._state = _KEY
+
+        elif state == _KEY:
+
+            if char == '}':
+                self._position += 1
+                self._state = _END
+                return True
+
+            key = self._decode(eof)
+            if key is _MISSING:
+                return False
+
+            self._key = key
+            self._state = _COLON
+
+        elif state == _COLON:
+            self._expect(char, ':')
+            self._state = _VALUE
+
+        elif state == _VALUE:
+
+            if self._key == 'tracks' and char == '[':
+                self._position += 1
+                self._state = _ARRAY
+                return True
+
+            value = self._decode(eof)
+            if value is _MISSING:
+                return False
+
+            if self._key == 'loadType':
+                self.load_type = value
+            elif self._key == 'playlistInfo':
+                self.playlist_info = value
+            elif self._key == 'exception':
+                self.exception = value
+
+            self._state = _NEXT_KEY
+
+        elif state == _NEXT_KEY:
+
+            if char == ',':
+                self._position += 1
+                self._state = _KEY
+            else:
+                self._expect(char, '}')
+                self._state = _END
+
+        elif state == _ARRAY or state == _ELEMENT:
+
+            if state == _ARRAY and char == ']':
+                self._position += 1
+                self._state = _NEXT_KEY
+                return True
+
+            track = self._decode(eof)
+            if track is _MISSING:
+                return False
+
+            self._tracks.append(self.node._build_track(track))
+            self.track_count += 1
+            self._state = _NEXT_ELEMENT
+
+        elif state == _NEXT_ELEMENT:
+
+            if char == ',':
+                self._position += 1
+                self._state = _ELEMENT
+            else:
+                self._expect(char, ']')
+                self._state = _NEXT_KEY
+
+        return True
@@ -76,46 +76,69 @@ class WebSocket:
                 raise exceptions.NodeConnectionError(msg)
 
             else:
-                message = message.json()
-                op = message.get('op')
+                await self._handle_payload(message.json())
 
-                if op == 'stats':
+    async def _handle_payload(self, message: dict) -> None:
 
-                    __log__.debug(f'Node \'{self.node.identifier}\' received stats payload | {message}')
-                    self.node.stats = objects.Stats(message)
+        if self.client.recorder is not None:
+            self.client.recorder.record('in', self.node.identifier, message)
 
-                elif op == 'event':
+        op = message.get('op')
 
-                    __log__.debug(f'Node \'{self.node.identifier}\' received event payload | {message}')
+        if op == 'stats':
 
-                    try:
-                        player = self.node.players[int(message['guildId'])]
-                    except KeyError:
-                        continue
+            __log__.debug(f'Node \'{self.node.identifier}\' received stats payload | {message}')
+            self.node.stats = objects.Stats(message)
+            self.node.stats_history.append(self.node.stats)
 
-                    message['player'] = player
+        elif op == 'event':
 
-                    event = getattr(events, message['type'], None)
-                    if not event:
-                        continue
+            __log__.debug(f'Node \'{self.node.identifier}\' received event payload | {message}')
 
-                    event = event(message)
-                    self.bot.dispatch(f'diorite_{event.name}', event)
+            try:
+                player = self.node.players[int(message['guildId'])]
+            except KeyError:
+                if self.client.cluster is not None:
+                    await self.client.cluster.forward(message)
+                return
 
-                    __log__.info(f'Node \'{self.node.identifier}\' dispatched \'{event.type}\' '
-                                 f'event for player \'{player.guild.id}\'.')
+            message['player'] = player
+            player._touch()
 
-                elif op == 'playerUpdate':
+            event = getattr(events, message['type'], None)
+            if not event:
+                return
 
-                    __log__.debug(f'Node \'{self.node.identifier}\' received playerUpdate payload | {message}')
-                    try:
-                        player = self.node.players[int(message['guildId'])]
-                        await player._update_state(message)
-                    except KeyError:
-                        continue
+            event = event(message)
+            self.bot.dispatch(f'diorite_{event.name}', event)
 
-                else:
-                    __log__.warning(f'Node \'{self.node.identifier}\' received unknown payload | {message}')
+            __log__.info(f'Node \'{self.node.identifier}\' dispatched \'{event.type}\' '
+                         f'event for player \'{player.guild.id}\'.')
+
+        elif op == 'playerUpdate':
+
+            __log__.debug(f'Node \'{self.node.identifier}\' received playerUpdate payload | {message}')
+            try:
+                player = self.node.players[int(message['guildId'])]
+            except KeyError:
+                if self.client.cluster is not None:
+                    await self.client.cluster.forward(message)
+                return
+
+            await player._update_state(message)
+
+        else:
+            __log__.warning(f'Node \'{self.node.identifier}\' received unknown payload | {message}')
+
+    async def close(self) -> None:
+
+        if self.task is not None:
+            self.task.cancel()
+
+        if self.ws is not None and not self.ws.closed:
+            await self.ws.close()
+
+        __log__.info(f'Websocket for node \'{self.node.identifier}\' has closed.')
 
     async def send(self, **data) -> None:
 
@@ -123,6 +146,10 @@ class WebSocket:
             raise exceptions.NodeNotAvailable(f'Node \'{self.node.identifier}\' is not currently available.')
 
         await self.ws.send_json(data)
+
+        if self.client.recorder is not None:
+            self.client.recorder.record('out', self.node.identifier, data)
+
         __log__.debug(f'Node \'{self.node.identifier}\' has sent payload | {data}')
 
     def __repr__(self):
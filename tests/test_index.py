@@ -0,0 +1,115 @@
+import gc
+
+import pytest
+
+pytest.importorskip('aiohttp')
+pytest.importorskip('discord')
+
+from diorite import objects  # noqa: E402
+from diorite.index import PrefixIndex  # noqa: E402
+
+
+def _track(index: int, title: str = None) -> objects.Track:
+    return objects.Track(track_id=f'track{index}', info={'title': title or f'Never Gonna Give You Up {index}',
+                                                          'author': 'Rick Astley'})
+
+
+def _ids(tracks: list) -> list:
+    return [track.track_id for track in tracks]
+
+
+def test_invalid_size():
+
+    with pytest.raises(ValueError):
+        PrefixIndex(size=0)
+
+
+def test_search_matches_any_word():
+
+    index = PrefixIndex()
+    index.add_many([_track(1), _track(2, 'Together Forever')])
+
+    assert _ids(index.search('gonna')) == ['track1']
+    assert _ids(index.search('  TOGETHER  for')) == ['track2']
+    assert _ids(index.search('rick', limit=5)) == ['track1', 'track2']
+    assert index.search('') == []
+    assert index.search('nothing') == []
+
+
+def test_pending_keys_are_merged_before_search():
+
+    index = PrefixIndex()
+    index.add(_track(1))
+    index.search('never')
+
+    index.add(_track(2, 'Never Gonna Stop'))
+    assert index.pending
+
+    assert _ids(index.search('never gonna', limit=5)) == ['track1', 'track2']
+    assert not index.pending
+
+
+def test_lru_eviction():
+
+    index = PrefixIndex(size=3)
+    index.add_many(_track(number) for number in range(3))
+
+    # Searching for the oldest track makes it the most recently used one, so the next add evicts track1 instead.
+    assert _ids(index.search('never gonna give you up 0')) == ['track0']
+    index.add(_track(3))
+
+    assert len(index) == 3
+    assert 'track1' not in index
+    assert index.search('never gonna give you up 1') == []
+    assert _ids(index.search('never gonna give you up 0')) == ['track0']
+
+
+def test_remove():
+
+    index = PrefixIndex()
+    index.add_many([_track(1), _track(2)])
+    index.remove('track1')
+    index.remove('missing')
+
+    assert _ids(index.search('never', limit=5)) == ['track2']
+
+
+def test_stale_keys_are_rebuilt():
+
+    index = PrefixIndex(size=2)
+    index.add_many(_track(number) for number in range(10))
+    index.search('rick')
+
+    assert index.stale == 0
+    assert {track_id for _, track_id in index.keys} == {'track8', 'track9'}
+
+
+def test_readding_an_evicted_track():
+
+    index = PrefixIndex(size=2)
+    index.add_many([_track(1), _track(2)])
+    index.search('never')
+
+    index.add(_track(3))
+    index.add(_track(1, 'Together Forever'))
+
+    assert _ids(index.search('never', limit=5)) == ['track3']
+    assert _ids(index.search('together')) == ['track1']
+    assert _ids(index.search('rick', limit=5)) == ['track1', 'track3']
+
+
+def test_does_not_keep_tracks_alive():
+
+    table = objects.TrackTable()
+    index = PrefixIndex(table=table)
+
+    track = table.intern(_track(1))
+    index.add(track)
+    del track
+    gc.collect()
+
+    assert len(table) == 0
+
+    result = index.search('never')
+    assert _ids(result) == ['track1']
+    assert result[0] is table.intern(_track(1))
@@ -0,0 +1,190 @@
+import asyncio
+import collections
+import time
+
+import pytest
+
+pytest.importorskip('aiohttp')
+pytest.importorskip('discord')
+
+from diorite.reaper import Reaper  # noqa: E402
+
+
+class _Member:
+
+    def __init__(self, bot: bool):
+        self.bot = bot
+
+
+class _Channel:
+
+    def __init__(self, *bots: bool):
+        self.members = [_Member(bot) for bot in bots]
+
+
+class _Guild:
+
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+
+
+class _Node:
+
+    def __init__(self):
+        self.players = {}
+
+
+class _Player:
+
+    def __init__(self, node: _Node, guild_id: int, last_activity: float = 0, channel: _Channel = None):
+
+        self.node = node
+        self.guild = _Guild(guild_id)
+        self.voice_channel = channel
+        self.last_activity = last_activity
+        self.alone_since = None
+        self.destroyed = 0
+
+        self.node.players[guild_id] = self
+
+    async def destroy(self) -> None:
+        self.destroyed += 1
+        del self.node.players[self.guild.id]
+
+
+class _Bot:
+
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.dispatched = collections.Counter()
+
+    def dispatch(self, event: str, *args) -> None:
+        self.dispatched[event] += 1
+
+
+class _Client:
+
+    def __init__(self, loop=None):
+        self.bot = _Bot(loop)
+
+
+class _Reaper(Reaper):
+    # Records reaps instead of scheduling the destroy so that _check can be run without an event loop.
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reaped = []
+
+    def _reap(self, player, reason: str) -> None:
+        self.reaped.append((player.guild.id, reason))
+
+
+def _deadlines(reaper: Reaper) -> dict:
+    return {player.guild.id: deadline for deadline, _, player in reaper.heap}
+
+
+def test_needs_a_timeout():
+
+    with pytest.raises(ValueError):
+        Reaper(_Client())
+
+
+def test_active_player_is_rescheduled_from_its_last_activity():
+
+    reaper = _Reaper(_Client(), idle_timeout=60)
+    player = _Player(_Node(), 1, last_activity=100)
+
+    reaper._check(player, now=130)
+
+    assert reaper.reaped == []
+    assert _deadlines(reaper) == {1: 160}
+
+
+def test_idle_player_is_reaped_and_not_rescheduled():
+
+    reaper = _Reaper(_Client(), idle_timeout=60)
+    player = _Player(_Node(), 1, last_activity=100)
+
+    reaper._check(player, now=160)
+
+    assert reaper.reaped == [(1, 'idle')]
+    assert reaper.heap == []
+
+
+def test_replaced_player_is_dropped():
+
+    node = _Node()
+    reaper = _Reaper(_Client(), idle_timeout=60)
+    player = _Player(node, 1)
+    _Player(node, 1)
+
+    reaper._check(player, now=1000)
+
+    assert reaper.reaped == []
+    assert reaper.heap == []
+
+
+def test_alone_player():
+
+    reaper = _Reaper(_Client(), alone_timeout=30)
+    player = _Player(_Node(), 1, channel=_Channel(True))
+
+    reaper._check(player, now=100)
+    assert player.alone_since == 100
+    assert _deadlines(reaper) == {1: 130}
+
+    reaper.heap.clear()
+    reaper._check(player, now=130)
+    assert reaper.reaped == [(1, 'alone')]
+    assert reaper.heap == []
+
+
+def test_alone_timer_resets_when_someone_joins():
+
+    reaper = _Reaper(_Client(), alone_timeout=30)
+    player = _Player(_Node(), 1, channel=_Channel(True))
+
+    reaper._check(player, now=100)
+    reaper.heap.clear()
+
+    player.voice_channel = _Channel(True, False)
+    reaper._check(player, now=120)
+
+    assert player.alone_since is None
+    assert _deadlines(reaper) == {1: 135}
+
+
+def test_earliest_deadline_wins():
+
+    reaper = _Reaper(_Client(), idle_timeout=60, alone_timeout=30)
+    player = _Player(_Node(), 1, last_activity=100, channel=_Channel(True))
+
+    reaper._check(player, now=100)
+
+    assert _deadlines(reaper) == {1: 130}
+
+
+def test_run_reaps_idle_players():
+
+    async def run():
+
+        client = _Client(asyncio.get_running_loop())
+        reaper = Reaper(client, idle_timeout=0.05)
+
+        node = _Node()
+        idle = _Player(node, 1, last_activity=0)
+        active = _Player(node, 2, last_activity=time.monotonic() + 10)
+
+        reaper.schedule(idle)
+        reaper.schedule(active)
+        await asyncio.sleep(0.2)
+        reaper.stop()
+
+        return client, idle, active, reaper
+
+    client, idle, active, reaper = asyncio.run(run())
+
+    assert idle.destroyed == 1
+    assert active.destroyed == 0
+    assert client.bot.dispatched['diorite_player_reaped'] == 1
+    assert [player for _, _, player in reaper.heap] == [active]
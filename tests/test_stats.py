@@ -0,0 +1,100 @@
+import math
+
+import pytest
+
+pytest.importorskip('aiohttp')
+pytest.importorskip('discord')
+
+from diorite import objects  # noqa: E402
+
+
+def _stats(players: int = 0, cpu: float = None, sent: int = None) -> objects.Stats:
+
+    data = {'players': players, 'playingPlayers': players}
+    if cpu is not None:
+        data['cpu'] = {'systemLoad': cpu, 'lavalinkLoad': cpu, 'cores': 4}
+    if sent is not None:
+        data['frameStats'] = {'sent': sent, 'nulled': 0, 'deficit': 0}
+
+    return objects.Stats(data)
+
+
+def _history(values: list, size: int = 4) -> objects.StatsHistory:
+
+    history = objects.StatsHistory(size=size)
+    for timestamp, players in enumerate(values):
+        history.append(_stats(players=players), timestamp=timestamp * 60)
+
+    return history
+
+
+def test_invalid_size():
+
+    with pytest.raises(ValueError):
+        objects.StatsHistory(size=0)
+
+
+def test_empty():
+
+    history = objects.StatsHistory(size=4)
+
+    assert len(history) == 0
+    assert history.latest is None
+    assert history.mean('players') is None
+    assert history.max('players') is None
+    assert history.rate('frames_sent') is None
+
+
+def test_wraparound_keeps_newest_samples():
+
+    history = _history([1, 2, 3, 4, 5, 6])
+
+    assert len(history) == 4
+    assert history.latest['players'] == 6
+    assert history.min('players') == 3
+    assert history.max('players') == 6
+    assert history.mean('players') == 4.5
+
+
+def test_window_cutoff():
+
+    history = _history([1, 2, 3, 4, 5, 6])
+
+    # Samples are a minute apart, so a two minute window holds the newest three and stops at the ring boundary.
+    assert history.mean('players', window=120) == 5
+    assert history.min('players', window=0) == 6
+    assert history.min('players', window=10 ** 6) == 3
+
+
+def test_missing_stats_are_skipped():
+
+    history = objects.StatsHistory(size=4)
+    history.append(_stats(cpu=0.5), timestamp=0)
+    history.append(_stats(), timestamp=60)
+
+    assert history.latest['cpu_system_load'] is None
+    assert history.mean('cpu_system_load') == 0.5
+    assert history.min('cpu_system_load') == 0.5
+    assert math.isnan(history.fields['cpu_system_load'][1])
+
+
+def test_rate_is_time_weighted():
+
+    history = objects.StatsHistory(size=8)
+    history.append(_stats(sent=3000), timestamp=0)
+    history.append(_stats(sent=3000), timestamp=60)
+    history.append(_stats(sent=1500), timestamp=180)
+
+    assert history.rate('frames_sent') == 2000
+
+
+def test_rate_skips_missing_samples():
+
+    history = objects.StatsHistory(size=8)
+    history.append(_stats(sent=3000), timestamp=0)
+    history.append(_stats(), timestamp=60)
+    history.append(_stats(sent=1500), timestamp=120)
+    history.append(_stats(), timestamp=180)
+
+    assert history.rate('frames_sent') == 1500
+    assert history.rate('frames_sent', window=90) == 1500
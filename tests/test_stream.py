@@ -0,0 +1,164 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip('aiohttp')
+pytest.importorskip('discord')
+
+from diorite import exceptions, objects  # noqa: E402
+from diorite.stream import TrackStream  # noqa: E402
+
+
+def _track(index: int) -> dict:
+    return {'track': f'QAAAjQIAJVJpY2sgQXN0bGV5{index}',
+            'info': {'identifier': 'dQw4w9WgXcQ', 'title': f'Never Gonna Give You Up ❤ "{index}"',
+                     'author': 'Rick Astley', 'length': 212000, 'isStream': False, 'isSeekable': True,
+                     'position': 0, 'uri': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'}}
+
+
+def _body(load_type: str = 'PLAYLIST_LOADED', count: int = 25, **extra) -> bytes:
+
+    data = {'loadType': load_type, 'playlistInfo': {}, 'tracks': [_track(index) for index in range(count)]}
+    if load_type == 'PLAYLIST_LOADED':
+        data['playlistInfo'] = {'name': 'Rickroll', 'selectedTrack': -1}
+
+    data.update(extra)
+    return json.dumps(data, indent=2).encode()
+
+
+class _Content:
+
+    def __init__(self, body: bytes):
+        self.body = body
+
+    async def iter_chunked(self, size: int):
+        for start in range(0, len(self.body), size):
+            yield self.body[start:start + size]
+
+
+class _Response:
+
+    def __init__(self, body: bytes):
+        self.content = _Content(body)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class _Session:
+
+    def __init__(self, body: bytes):
+        self.body = body
+
+    def get(self, url: str, headers: dict):
+        return _Response(self.body)
+
+
+class _Node:
+
+    identifier = 'test'
+    rest_uri = 'http://localhost:2333/'
+    password = 'youshallnotpass'
+
+    def __init__(self, body: bytes):
+        self.session = _Session(body)
+        self.requests = 0
+
+    @staticmethod
+    def _build_track(track: dict) -> objects.Track:
+        return objects.Track(track_id=track.get('track'), info=track.get('info'))
+
+    @staticmethod
+    def _index_tracks(tracks) -> None:
+        pass
+
+
+def _collect(stream: TrackStream) -> list:
+
+    async def collect():
+        return [track async for track in stream]
+
+    return asyncio.run(collect())
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 4096])
+def test_chunk_boundaries(chunk_size):
+
+    node = _Node(_body())
+    stream = TrackStream(node, 'ytsearch:rick', chunk_size=chunk_size)
+    tracks = _collect(stream)
+
+    assert [track.track_id for track in tracks] == [_track(index)['track'] for index in range(25)]
+    assert tracks[3].title == 'Never Gonna Give You Up ❤ "3"'
+    assert stream.is_playlist
+    assert stream.name == 'Rickroll'
+    assert stream.selected_track == -1
+    assert node.requests == 0
+
+
+def test_search_result_is_not_playlist():
+
+    stream = TrackStream(_Node(_body('SEARCH_RESULT', count=5)), 'ytsearch:rick', chunk_size=16)
+
+    assert len(_collect(stream)) == 5
+    assert stream.load_type == 'SEARCH_RESULT'
+    assert not stream.is_playlist
+
+
+def test_tracks_before_load_type():
+
+    body = json.dumps({'tracks': [_track(0), _track(1)], 'playlistInfo': {}, 'loadType': 'TRACK_LOADED'}).encode()
+    stream = TrackStream(_Node(body), 'ytsearch:rick', chunk_size=5)
+
+    assert len(_collect(stream)) == 2
+    assert stream.load_type == 'TRACK_LOADED'
+
+
+def test_no_matches():
+
+    stream = TrackStream(_Node(_body('NO_MATCHES', count=0)), 'ytsearch:nothing', chunk_size=3)
+
+    assert _collect(stream) == []
+    assert stream.load_type == 'NO_MATCHES'
+
+
+def test_load_failed():
+
+    body = _body('LOAD_FAILED', count=0, exception={'message': 'Blocked', 'severity': 'COMMON'})
+    stream = TrackStream(_Node(body), 'ytsearch:rick', chunk_size=8)
+
+    with pytest.raises(exceptions.TrackLoadError) as error:
+        _collect(stream)
+
+    assert error.value.severity == 'COMMON'
+
+
+@pytest.mark.parametrize('cut', [1, 10, 200, -40, -2])
+def test_truncated_body(cut):
+
+    body = _body()
+    node = _Node(body[:cut])
+
+    with pytest.raises(exceptions.TrackLoadError):
+        _collect(TrackStream(node, 'ytsearch:rick', chunk_size=32))
+
+    assert node.requests == 0
+
+
+def test_malformed_body():
+
+    with pytest.raises(exceptions.TrackLoadError):
+        _collect(TrackStream(_Node(b'{"loadType" "SEARCH_RESULT"}'), 'ytsearch:rick'))
+
+
+def test_single_iteration():
+
+    stream = TrackStream(_Node(_body(count=2)), 'ytsearch:rick')
+    _collect(stream)
+
+    with pytest.raises(RuntimeError):
+        _collect(stream)